@@ -1,13 +1,26 @@
+import fcntl
+import hashlib
+import mimetypes
 import os
 import re
 import sqlite3
 import sys
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
+from urllib.parse import quote
 
-from flask import Flask, abort, g, redirect, render_template, request, url_for
+from flask import Flask, Request, abort, current_app, g, redirect, render_template, request, send_file, url_for
 from markupsafe import Markup
 import markdown
+from PIL import Image, UnidentifiedImageError
 from opentelemetry import context, trace
 from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
 from opentelemetry.sdk.resources import Resource
@@ -19,6 +32,14 @@ from opentelemetry.trace import SpanKind, Status, StatusCode
 SLUG_RE = re.compile(r"[^a-z0-9]+")
 WHITESPACE_RE = re.compile(r"\s+")
 TRACER_NAME = "cluster-lite-wiki"
+PROBE_PATHS = frozenset({"/healthz", "/readyz"})
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+THUMBNAIL_SIZE = (320, 320)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+AUTO_VACUUM_INCREMENTAL = 2
+INCREMENTAL_VACUUM_BATCH_PAGES = 256
+ANALYSIS_LIMIT_ROWS = 400
+MAINTENANCE_BUSY_TIMEOUT_SECONDS = 60
 _TRACING_CONFIGURED = False
 
 
@@ -71,25 +92,30 @@ def configure_tracing() -> bool:
     return True
 
 
-def _start_request_span() -> None:
+def _start_request_span(current_request, request_globals) -> None:
     tracer = trace.get_tracer(TRACER_NAME)
     span = tracer.start_span(
-        f"{request.method} {request.path}",
+        f"{current_request.method} {current_request.path}",
         kind=SpanKind.SERVER,
     )
-    span.set_attribute("http.request.method", request.method)
-    span.set_attribute("url.path", request.path)
-    if request.host:
-        span.set_attribute("server.address", request.host)
+    span.set_attribute("http.request.method", current_request.method)
+    span.set_attribute("url.path", current_request.path)
+    if current_request.host:
+        span.set_attribute("server.address", current_request.host)
 
     token = context.attach(trace.set_span_in_context(span))
-    g._otel_request_span = span
-    g._otel_request_token = token
+    request_globals._otel_request_span = span
+    request_globals._otel_request_token = token
 
 
-def _finish_request_span(*, status_code: int | None = None, error_obj: BaseException | None = None) -> None:
-    span = g.pop("_otel_request_span", None)
-    token = g.pop("_otel_request_token", None)
+def _finish_request_span(
+    request_globals,
+    *,
+    status_code: int | None = None,
+    error_obj: BaseException | None = None,
+) -> None:
+    span = request_globals.pop("_otel_request_span", None)
+    token = request_globals.pop("_otel_request_token", None)
     if span is None:
         return
 
@@ -138,13 +164,112 @@ def slugify(value: str) -> str:
     return slug
 
 
-def render_markdown(source: str) -> Markup:
-    html = markdown.markdown(
+def markdown_html(source: str) -> str:
+    return markdown.markdown(
         source,
         extensions=["extra", "sane_lists", "tables"],
         output_format="html5",
     )
-    return Markup(html)
+
+
+def render_markdown(source: str) -> Markup:
+    return Markup(markdown_html(source))
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.waiters = 0
+        self.result = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one computation."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: dict = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                self._flights[key] = flight
+            else:
+                flight.waiters += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        try:
+            flight.result = fn()
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flights.pop(key, None)
+            flight.done.set()
+        return flight.result
+
+
+class RenderCache:
+    """Rendered page bodies keyed by slug and invalidated by updated_at."""
+
+    def __init__(self, max_entries: int = 512) -> None:
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[str, Markup]] = OrderedDict()
+        self._flights = SingleFlight()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def lookup(self, slug: str, version: str) -> Markup | None:
+        with self._lock:
+            entry = self._entries.get(slug)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(slug)
+            return entry[1]
+
+    def store(self, slug: str, version: str, html: Markup) -> None:
+        with self._lock:
+            self._entries[slug] = (version, html)
+            self._entries.move_to_end(slug)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, slug: str, version: str, source: str) -> Markup:
+        cached = self.lookup(slug, version)
+        if cached is not None:
+            return cached
+
+        def render() -> Markup:
+            # A previous leader may have filled the entry while we queued.
+            cached = self.lookup(slug, version)
+            if cached is not None:
+                return cached
+            html = render_markdown(source)
+            self.store(slug, version, html)
+            return html
+
+        return self._flights.do((slug, version), render)
+
+    def discard(self, slug: str) -> None:
+        with self._lock:
+            self._entries.pop(slug, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
 
 
 def build_excerpt(source: str, limit: int = 260) -> str:
@@ -280,57 +405,467 @@ def write_seed_pages(
     return len(seed_pages)
 
 
-def create_app(test_config: dict | None = None) -> Flask:
-    app = Flask(__name__)
-    tracing_enabled = configure_tracing()
-    app_root = Path(__file__).resolve().parent
+class UploadSpool:
+    """Temporary upload file that hashes its content as Werkzeug streams it in."""
+
+    def __init__(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix="upload-", delete=False)
+        self.path = Path(self._file.name)
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name: str):
+        return getattr(self._file, name)
+
+    def discard(self) -> None:
+        self._file.close()
+        self.path.unlink(missing_ok=True)
+
+
+class WikiRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        spool = UploadSpool(current_app.config["ATTACHMENTS_DIR"] / "incoming")
+        g.setdefault("_upload_spools", []).append(spool)
+        return spool
+
+
+def blob_path(blobs_dir: Path, sha256: str) -> Path:
+    return blobs_dir / sha256[:2] / sha256
+
+
+def thumbnail_path(thumbnails_dir: Path, sha256: str) -> Path:
+    return thumbnails_dir / sha256[:2] / f"{sha256}.png"
+
+
+def store_blob(blobs_dir: Path, spool: UploadSpool) -> str:
+    sha256 = spool.digest.hexdigest()
+    target = blob_path(blobs_dir, sha256)
+    spool.close()
+    if target.exists():
+        spool.path.unlink(missing_ok=True)
+    else:
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(spool.path, target)
+    return sha256
+
 
-    data_dir = Path(
+def write_thumbnail(source: Path, target: Path) -> bool:
+    if target.exists():
+        return True
+    try:
+        with Image.open(source) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            if image.mode not in {"RGB", "RGBA"}:
+                image = image.convert("RGBA")
+            target.parent.mkdir(parents=True, exist_ok=True)
+            # Workers may race on the same image, so each writes its own temp file.
+            with tempfile.NamedTemporaryFile(
+                dir=target.parent,
+                prefix=f"{target.name}.",
+                suffix=".tmp",
+                delete=False,
+            ) as partial:
+                try:
+                    image.save(partial, format="PNG")
+                except BaseException:
+                    partial.close()
+                    Path(partial.name).unlink(missing_ok=True)
+                    raise
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        return False
+    os.replace(partial.name, target)
+    return True
+
+
+def fetch_pages(db: sqlite3.Connection, query: str = "") -> list[sqlite3.Row]:
+    if query:
+        like = f"%{query}%"
+        return execute_sql(
+            db,
+            """
+            SELECT slug, title, body, updated_at
+            FROM pages
+            WHERE title LIKE ? OR body LIKE ?
+            ORDER BY title COLLATE NOCASE
+            """,
+            (like, like),
+        ).fetchall()
+    return execute_sql(
+        db,
+        """
+        SELECT slug, title, body, updated_at
+        FROM pages
+        ORDER BY title COLLATE NOCASE
+        """
+    ).fetchall()
+
+
+def fetch_page(db: sqlite3.Connection, slug: str) -> sqlite3.Row | None:
+    return execute_sql(
+        db,
+        """
+        SELECT slug, title, body, created_at, updated_at
+        FROM pages
+        WHERE slug = ?
+        """,
+        (slug,),
+    ).fetchone()
+
+
+def parse_page_form(form) -> dict[str, str]:
+    title = form.get("title", "").strip()
+    body = form.get("body", "").strip()
+    requested_slug = form.get("slug", "").strip()
+
+    if not title:
+        raise ValueError("Title is required")
+    if not body:
+        raise ValueError("Body is required")
+
+    return {
+        "original_slug": form.get("original_slug", "").strip(),
+        "slug": slugify(requested_slug or title),
+        "title": title,
+        "body": body,
+    }
+
+
+def save_page_record(db: sqlite3.Connection, page: dict[str, str]) -> bool:
+    now = datetime.now(timezone.utc).isoformat()
+    if page["original_slug"]:
+        existing = execute_sql(
+            db,
+            "SELECT id FROM pages WHERE slug = ?",
+            (page["original_slug"],),
+        ).fetchone()
+        if existing is None:
+            return False
+        execute_sql(
+            db,
+            """
+            UPDATE pages
+            SET slug = ?, title = ?, body = ?, updated_at = ?
+            WHERE id = ?
+            """,
+            (page["slug"], page["title"], page["body"], now, existing[0]),
+        )
+    else:
+        execute_sql(
+            db,
+            """
+            INSERT INTO pages (slug, title, body, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (page["slug"], page["title"], page["body"], now, now),
+        )
+    return True
+
+
+def fetch_attachments(db: sqlite3.Connection) -> list[sqlite3.Row]:
+    return execute_sql(
+        db,
+        """
+        SELECT sha256, filename, content_type, size, created_at
+        FROM attachments
+        ORDER BY created_at DESC
+        """
+    ).fetchall()
+
+
+def fetch_attachment(db: sqlite3.Connection, sha256: str) -> sqlite3.Row | None:
+    if not SHA256_RE.match(sha256):
+        return None
+    return execute_sql(
+        db,
+        """
+        SELECT sha256, filename, content_type
+        FROM attachments
+        WHERE sha256 = ?
+        ORDER BY id
+        LIMIT 1
+        """,
+        (sha256,),
+    ).fetchone()
+
+
+def insert_attachment(
+    db: sqlite3.Connection,
+    sha256: str,
+    filename: str,
+    content_type: str,
+    size: int,
+) -> None:
+    execute_sql(
+        db,
+        """
+        INSERT OR IGNORE INTO attachments (sha256, filename, content_type, size, created_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        (sha256, filename, content_type, size, datetime.now(timezone.utc).isoformat()),
+    )
+
+
+def attachment_content_type(filename: str, mimetype: str | None) -> str:
+    if mimetype and mimetype != "application/octet-stream":
+        return mimetype
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
+
+def mark_immutable(response):
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    response.headers["X-Content-Type-Options"] = "nosniff"
+    response.headers["Content-Security-Policy"] = "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+    return response
+
+
+def database_needs_migration(db: sqlite3.Connection) -> bool:
+    auto_vacuum = execute_sql(db, "PRAGMA auto_vacuum").fetchone()[0]
+    journal_mode = execute_sql(db, "PRAGMA journal_mode").fetchone()[0]
+    return auto_vacuum != AUTO_VACUUM_INCREMENTAL or journal_mode.lower() != "wal"
+
+
+def content_disposition(download_name: str, *, as_attachment: bool) -> tuple[str, dict[str, str]]:
+    # Same header send_file builds, so the WSGI and ASGI apps name downloads identically.
+    try:
+        download_name.encode("ascii")
+    except UnicodeEncodeError:
+        simple = unicodedata.normalize("NFKD", download_name).encode("ascii", "ignore").decode("ascii")
+        names = {"filename": simple, "filename*": "UTF-8''" + quote(download_name, safe="!#$&+-.^_`|~")}
+    else:
+        names = {"filename": download_name}
+    return ("attachment" if as_attachment else "inline"), names
+
+
+def migrate_database(db: sqlite3.Connection) -> None:
+    auto_vacuum = execute_sql(db, "PRAGMA auto_vacuum").fetchone()[0]
+    if auto_vacuum != AUTO_VACUUM_INCREMENTAL:
+        # Switching an existing file to incremental mode only takes effect after VACUUM.
+        execute_sql(db, "PRAGMA auto_vacuum = INCREMENTAL")
+        execute_sql(db, "VACUUM")
+    execute_sql(db, "PRAGMA journal_mode = WAL")
+
+
+def database_stats(db: sqlite3.Connection, db_path: Path) -> dict[str, int]:
+    wal_path = db_path.with_name(db_path.name + "-wal")
+    return {
+        "file_size": db_path.stat().st_size + (wal_path.stat().st_size if wal_path.exists() else 0),
+        "page_count": execute_sql(db, "PRAGMA page_count").fetchone()[0],
+        "freelist_count": execute_sql(db, "PRAGMA freelist_count").fetchone()[0],
+    }
+
+
+def run_maintenance(
+    db_path: Path,
+    *,
+    full: bool = False,
+    busy_timeout: float = 1.0,
+) -> tuple[dict[str, int], dict[str, int]]:
+    db = sqlite3.connect(db_path, timeout=busy_timeout)
+    try:
+        before = database_stats(db, db_path)
+        if not full:
+            # A fresh connection has queried nothing, so a bare PRAGMA optimize
+            # would skip every table; sample a bounded number of rows instead.
+            execute_sql(db, f"PRAGMA analysis_limit = {ANALYSIS_LIMIT_ROWS}").fetchall()
+        execute_sql(db, "ANALYZE")
+
+        # Free pages in small batches so writers only ever wait for one batch.
+        freelist = before["freelist_count"]
+        while freelist > 0:
+            execute_sql(db, f"PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_BATCH_PAGES})").fetchall()
+            remaining = execute_sql(db, "PRAGMA freelist_count").fetchone()[0]
+            if remaining >= freelist:
+                break
+            freelist = remaining
+
+        checkpoint_mode = "TRUNCATE" if full else "PASSIVE"
+        checkpoint_busy = execute_sql(db, f"PRAGMA wal_checkpoint({checkpoint_mode})").fetchone()[0]
+        after = database_stats(db, db_path)
+        after["checkpoint_busy"] = checkpoint_busy
+    finally:
+        db.close()
+    return before, after
+
+
+@contextmanager
+def maintenance_lock(db_path: Path, *, wait: bool) -> Iterator[bool]:
+    # Gunicorn workers and the maintain command share the database file;
+    # only one of them should run a pass at a time.
+    lock_path = db_path.with_name(db_path.name + ".maintenance.lock")
+    with open(lock_path, "w") as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class MaintenanceScheduler:
+    """Runs run_maintenance in the background once the app has been idle for a while."""
+
+    def __init__(
+        self,
+        db_path: Path,
+        *,
+        interval_seconds: float,
+        idle_seconds: float,
+        logger,
+    ) -> None:
+        self.db_path = db_path
+        self.interval_seconds = interval_seconds
+        self.idle_seconds = idle_seconds
+        self.logger = logger
+        self.last_activity = time.monotonic()
+        self.last_run = time.monotonic()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
+
+    def is_due(self, now: float) -> bool:
+        elapsed = now - self.last_run
+        if elapsed < self.interval_seconds:
+            return False
+        idle = now - self.last_activity >= self.idle_seconds
+        return idle or elapsed >= 2 * self.interval_seconds
+
+    def run_once(self) -> bool:
+        with maintenance_lock(self.db_path, wait=False) as acquired:
+            if not acquired:
+                return False
+            before, after = run_maintenance(self.db_path)
+        self.logger.info(
+            "SQLite maintenance: %d -> %d bytes, %d -> %d free pages",
+            before["file_size"],
+            after["file_size"],
+            before["freelist_count"],
+            after["freelist_count"],
+        )
+        return True
+
+    def _loop(self) -> None:
+        poll_seconds = max(1.0, min(self.idle_seconds, self.interval_seconds) / 2)
+        while not self._stop.wait(poll_seconds):
+            now = time.monotonic()
+            if not self.is_due(now):
+                continue
+            self.last_run = now
+            try:
+                self.run_once()
+            except Exception:
+                self.logger.exception("SQLite maintenance failed")
+
+    def start(self) -> None:
+        if self.interval_seconds <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._loop, name="wiki-maintenance", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def warm_render_cache(
+    db: sqlite3.Connection,
+    cache: RenderCache,
+    budget_seconds: float,
+) -> int:
+    deadline = time.monotonic() + budget_seconds
+    # Warming more pages than the cache holds would evict the newest ones again.
+    rows = execute_sql(
+        db,
+        """
+        SELECT slug, body, updated_at
+        FROM pages
+        ORDER BY updated_at DESC
+        LIMIT ?
+        """,
+        (cache.max_entries,),
+    ).fetchall()
+    warmed = 0
+    for slug, body, updated_at in rows:
+        if time.monotonic() >= deadline:
+            break
+        cache.get(slug, updated_at, body)
+        warmed += 1
+    return warmed
+
+
+def resolve_data_dir(test_config: dict | None = None) -> Path:
+    return Path(
         (test_config or {}).get("DATA_DIR")
         or os.environ.get("WIKI_DATA_DIR")
         or (Path.cwd() / "data")
     )
-    seed_dir = Path(
+
+
+def resolve_seed_dir(test_config: dict | None = None) -> Path:
+    return Path(
         (test_config or {}).get("SEED_DIR")
         or os.environ.get("WIKI_SEED_DIR")
-        or (app_root / "seed" / "pages")
-    )
-    data_dir.mkdir(parents=True, exist_ok=True)
-    db_path = data_dir / "wiki.db"
-
-    app.config.update(
-        DATA_DIR=data_dir,
-        DATABASE=str(db_path),
-        SEED_DIR=seed_dir,
-        SITE_NAME=os.environ.get("WIKI_SITE_NAME", "Cluster Lite Wiki"),
+        or (Path(__file__).resolve().parent / "seed" / "pages")
     )
 
-    if test_config:
-        app.config.update(test_config)
-
-    if tracing_enabled:
-        @app.before_request
-        def begin_request_span() -> None:
-            _start_request_span()
 
-        @app.after_request
-        def end_request_span(response):
-            _finish_request_span(status_code=response.status_code)
-            return response
+def init_database(db_path: Path, seed_dir: Path) -> None:
+    db = sqlite3.connect(db_path, timeout=MAINTENANCE_BUSY_TIMEOUT_SECONDS)
+    if database_needs_migration(db):
+        # Every gunicorn worker (and an old pod mid-rollout) boots against the same
+        # file; let one of them run the VACUUM while the others wait their turn.
+        with maintenance_lock(db_path, wait=True):
+            migrate_database(db)
+    execute_sql(
+        db,
+        """
+        CREATE TABLE IF NOT EXISTS pages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            slug TEXT NOT NULL UNIQUE,
+            title TEXT NOT NULL,
+            body TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+        """
+    )
+    execute_sql(
+        db,
+        """
+        CREATE TABLE IF NOT EXISTS attachments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            sha256 TEXT NOT NULL,
+            filename TEXT NOT NULL,
+            content_type TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            UNIQUE (sha256, filename)
+        )
+        """
+    )
+    db.commit()
 
-        @app.teardown_request
-        def teardown_request_span(error_obj: BaseException | None) -> None:
-            if error_obj is not None:
-                _finish_request_span(error_obj=error_obj)
+    existing_rows = execute_sql(db, "SELECT COUNT(*) FROM pages").fetchone()[0]
+    if existing_rows == 0:
+        seed_pages = load_seed_pages(seed_dir)
+        if write_seed_pages(db, seed_pages) > 0:
+            db.commit()
+    db.close()
 
-    def get_db() -> sqlite3.Connection:
-        if "db" not in g:
-            g.db = sqlite3.connect(app.config["DATABASE"])
-            g.db.row_factory = sqlite3.Row
-        return g.db
 
-    def init_db() -> None:
-        db = sqlite3.connect(app.config["DATABASE"])
+def reseed_database(db_path: Path, seed_dir: Path) -> int:
+    db = sqlite3.connect(db_path)
+    try:
         execute_sql(
             db,
             """
@@ -344,37 +879,144 @@ def create_app(test_config: dict | None = None) -> Flask:
             )
             """
         )
+        seed_pages = load_seed_pages(seed_dir)
+        inserted = write_seed_pages(db, seed_pages, replace_existing=True)
         db.commit()
-
-        existing_rows = execute_sql(db, "SELECT COUNT(*) FROM pages").fetchone()[0]
-        if existing_rows == 0:
-            seed_pages = load_seed_pages(app.config["SEED_DIR"])
-            if write_seed_pages(db, seed_pages) > 0:
-                db.commit()
+        return inserted
+    finally:
         db.close()
 
-    def reseed_pages() -> int:
-        db = sqlite3.connect(app.config["DATABASE"])
+
+def load_config(test_config: dict | None = None) -> dict:
+    data_dir = resolve_data_dir(test_config)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    config = {
+        "DATA_DIR": data_dir,
+        "DATABASE": str(data_dir / "wiki.db"),
+        "MAX_CONTENT_LENGTH": int(os.environ.get("WIKI_MAX_UPLOAD_MB", "25")) * 1024 * 1024,
+        "THUMBNAIL_WORKERS": int(os.environ.get("WIKI_THUMBNAIL_WORKERS", "2")),
+        "USE_X_SENDFILE": _env_flag("WIKI_USE_X_SENDFILE", False),
+        "SEED_DIR": resolve_seed_dir(test_config),
+        "SITE_NAME": os.environ.get("WIKI_SITE_NAME", "Cluster Lite Wiki"),
+        "RENDER_CACHE_SIZE": int(os.environ.get("WIKI_RENDER_CACHE_SIZE", "512")),
+        "WARMUP_BUDGET_SECONDS": float(os.environ.get("WIKI_WARMUP_BUDGET_SECONDS", "10")),
+        "WARMUP_BACKGROUND": _env_flag("WIKI_WARMUP_BACKGROUND", True),
+        "MAINTENANCE_INTERVAL_SECONDS": float(os.environ.get("WIKI_MAINTENANCE_INTERVAL_SECONDS", "3600")),
+        "MAINTENANCE_IDLE_SECONDS": float(os.environ.get("WIKI_MAINTENANCE_IDLE_SECONDS", "30")),
+    }
+    if test_config:
+        config.update(test_config)
+    config.setdefault("ATTACHMENTS_DIR", Path(config["DATA_DIR"]) / "attachments")
+    return config
+
+
+class WikiState:
+    """Database, render cache, warmup, maintenance and thumbnails shared by both front ends."""
+
+    def __init__(self, config, logger) -> None:
+        self.db_path = Path(config["DATABASE"])
+        self.seed_dir = Path(config["SEED_DIR"])
+        self.blobs_dir = Path(config["ATTACHMENTS_DIR"]) / "blobs"
+        self.thumbnails_dir = Path(config["ATTACHMENTS_DIR"]) / "thumbnails"
+        self.warmup_budget_seconds = config["WARMUP_BUDGET_SECONDS"]
+        self.warmup_background = config["WARMUP_BACKGROUND"]
+        self.logger = logger
+        self.render_cache = RenderCache(config["RENDER_CACHE_SIZE"])
+        self.warmup_complete = threading.Event()
+        self.thumbnail_executor = ThreadPoolExecutor(
+            max_workers=config["THUMBNAIL_WORKERS"],
+            thread_name_prefix="wiki-thumbnails",
+        )
+        self.maintenance = MaintenanceScheduler(
+            self.db_path,
+            interval_seconds=config["MAINTENANCE_INTERVAL_SECONDS"],
+            idle_seconds=config["MAINTENANCE_IDLE_SECONDS"],
+            logger=logger,
+        )
+
+    def start(self) -> None:
+        init_database(self.db_path, self.seed_dir)
+        if self.warmup_background:
+            threading.Thread(target=self.warm_up, name="wiki-warmup", daemon=True).start()
+        else:
+            self.warm_up()
+        self.maintenance.start()
+
+    def close(self) -> None:
+        self.maintenance.stop()
+        self.thumbnail_executor.shutdown(wait=True)
+
+    def warm_up(self) -> None:
         try:
-            execute_sql(
-                db,
-                """
-                CREATE TABLE IF NOT EXISTS pages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    slug TEXT NOT NULL UNIQUE,
-                    title TEXT NOT NULL,
-                    body TEXT NOT NULL,
-                    created_at TEXT NOT NULL,
-                    updated_at TEXT NOT NULL
-                )
-                """
-            )
-            seed_pages = load_seed_pages(app.config["SEED_DIR"])
-            inserted = write_seed_pages(db, seed_pages, replace_existing=True)
-            db.commit()
-            return inserted
+            if self.warmup_budget_seconds <= 0:
+                return
+            db = sqlite3.connect(self.db_path)
+            try:
+                warmed = warm_render_cache(db, self.render_cache, self.warmup_budget_seconds)
+            finally:
+                db.close()
+            self.logger.info("Warmed %d page render%s", warmed, "" if warmed == 1 else "s")
+        except Exception:
+            self.logger.exception("Render cache warmup failed")
         finally:
-            db.close()
+            self.warmup_complete.set()
+
+    def reseed_pages(self) -> int:
+        inserted = reseed_database(self.db_path, self.seed_dir)
+        self.render_cache.clear()
+        return inserted
+
+    def queue_thumbnail(self, sha256: str):
+        return self.thumbnail_executor.submit(
+            write_thumbnail,
+            blob_path(self.blobs_dir, sha256),
+            thumbnail_path(self.thumbnails_dir, sha256),
+        )
+
+
+def create_app(test_config: dict | None = None) -> Flask:
+    app = Flask(__name__)
+    tracing_enabled = configure_tracing()
+    app.request_class = WikiRequest
+    app.config.update(load_config(test_config))
+
+    state = WikiState(app.config, app.logger)
+    blobs_dir = state.blobs_dir
+    thumbnails_dir = state.thumbnails_dir
+    render_cache = state.render_cache
+
+    @app.before_request
+    def record_activity() -> None:
+        if request.path not in PROBE_PATHS:
+            state.maintenance.touch()
+
+    if tracing_enabled:
+        @app.before_request
+        def begin_request_span() -> None:
+            if request.path in PROBE_PATHS:
+                return
+            _start_request_span(request, g)
+
+        @app.after_request
+        def end_request_span(response):
+            _finish_request_span(g, status_code=response.status_code)
+            return response
+
+        @app.teardown_request
+        def teardown_request_span(error_obj: BaseException | None) -> None:
+            if error_obj is not None:
+                _finish_request_span(g, error_obj=error_obj)
+
+    def get_db() -> sqlite3.Connection:
+        if "db" not in g:
+            g.db = sqlite3.connect(app.config["DATABASE"])
+            g.db.row_factory = sqlite3.Row
+        return g.db
+
+    @app.teardown_request
+    def discard_upload_spools(_error: BaseException | None) -> None:
+        for spool in g.pop("_upload_spools", []):
+            spool.discard()
 
     @app.teardown_appcontext
     def close_db(_error: BaseException | None) -> None:
@@ -382,10 +1024,6 @@ def create_app(test_config: dict | None = None) -> Flask:
         if db is not None:
             db.close()
 
-    @app.template_filter("markdown")
-    def markdown_filter(value: str) -> Markup:
-        return render_markdown(value)
-
     @app.template_filter("excerpt")
     def excerpt_filter(value: str, limit: int = 260) -> str:
         return build_excerpt(value, limit)
@@ -394,6 +1032,16 @@ def create_app(test_config: dict | None = None) -> Flask:
     def inject_globals() -> dict:
         return {"site_name": app.config["SITE_NAME"]}
 
+    @app.get("/healthz")
+    def healthz():
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    def readyz():
+        if not state.warmup_complete.is_set():
+            return {"status": "warming"}, 503
+        return {"status": "ready", "cached_pages": len(render_cache)}
+
     @app.get("/")
     def index():
         return redirect(url_for("list_pages"))
@@ -401,28 +1049,7 @@ def create_app(test_config: dict | None = None) -> Flask:
     @app.get("/pages")
     def list_pages():
         query = request.args.get("q", "").strip()
-        db = get_db()
-        if query:
-            like = f"%{query}%"
-            pages = execute_sql(
-                db,
-                """
-                SELECT slug, title, body, updated_at
-                FROM pages
-                WHERE title LIKE ? OR body LIKE ?
-                ORDER BY title COLLATE NOCASE
-                """,
-                (like, like),
-            ).fetchall()
-        else:
-            pages = execute_sql(
-                db,
-                """
-                SELECT slug, title, body, updated_at
-                FROM pages
-                ORDER BY title COLLATE NOCASE
-                """
-            ).fetchall()
+        pages = fetch_pages(get_db(), query)
         return render_template(
             "list.html",
             pages=pages,
@@ -441,110 +1068,161 @@ def create_app(test_config: dict | None = None) -> Flask:
 
     @app.post("/pages")
     def save_page():
-        db = get_db()
-        original_slug = request.form.get("original_slug", "").strip()
-        title = request.form.get("title", "").strip()
-        body = request.form.get("body", "").strip()
-        requested_slug = request.form.get("slug", "").strip()
-
-        if not title:
-            abort(400, "Title is required")
-        if not body:
-            abort(400, "Body is required")
-
         try:
-            slug = slugify(requested_slug or title)
+            page = parse_page_form(request.form)
         except ValueError as exc:
             abort(400, str(exc))
 
-        now = datetime.now(timezone.utc).isoformat()
-
+        db = get_db()
         try:
-            if original_slug:
-                page = execute_sql(
-                    db,
-                    "SELECT id FROM pages WHERE slug = ?",
-                    (original_slug,),
-                ).fetchone()
-                if page is None:
-                    abort(404)
-                execute_sql(
-                    db,
-                    """
-                    UPDATE pages
-                    SET slug = ?, title = ?, body = ?, updated_at = ?
-                    WHERE id = ?
-                    """,
-                    (slug, title, body, now, page["id"]),
-                )
-            else:
-                execute_sql(
-                    db,
-                    """
-                    INSERT INTO pages (slug, title, body, created_at, updated_at)
-                    VALUES (?, ?, ?, ?, ?)
-                    """,
-                    (slug, title, body, now, now),
-                )
+            if not save_page_record(db, page):
+                abort(404)
         except sqlite3.IntegrityError:
             abort(409, "A page with that slug already exists")
 
         db.commit()
-        return redirect(url_for("view_page", slug=slug))
+        if page["original_slug"]:
+            render_cache.discard(page["original_slug"])
+        return redirect(url_for("view_page", slug=page["slug"]))
 
     @app.get("/pages/<slug>")
     def view_page(slug: str):
         db = get_db()
-        page = execute_sql(
-            db,
-            """
-            SELECT slug, title, body, created_at, updated_at
-            FROM pages
-            WHERE slug = ?
-            """,
-            (slug,),
-        ).fetchone()
+        page = fetch_page(db, slug)
         if page is None:
             abort(404)
-        nav_pages = execute_sql(
-            db,
-            """
-            SELECT slug, title, body, updated_at
-            FROM pages
-            ORDER BY title COLLATE NOCASE
-            """
-        ).fetchall()
+        nav_pages = fetch_pages(db)
         return render_template(
             "view.html",
             page=page,
+            page_html=render_cache.get(page["slug"], page["updated_at"], page["body"]),
             nav_pages=nav_pages,
             grouped_pages=group_pages(nav_pages),
         )
 
     @app.get("/pages/<slug>/edit")
     def edit_page(slug: str):
-        page = execute_sql(
-            get_db(),
-            "SELECT slug, title, body FROM pages WHERE slug = ?",
-            (slug,),
-        ).fetchone()
+        page = fetch_page(get_db(), slug)
         if page is None:
             abort(404)
         return render_template("edit.html", page=page, is_new=False)
 
-    app.reseed_pages = reseed_pages
-    init_db()
+    @app.get("/attachments")
+    def list_attachments():
+        return render_template("attachments.html", attachments=fetch_attachments(get_db()))
+
+    @app.post("/attachments")
+    def upload_attachment():
+        upload = request.files.get("file")
+        if upload is None or not upload.filename:
+            abort(400, "File is required")
+        spool = upload.stream
+        if not isinstance(spool, UploadSpool):
+            abort(400, "Upload was not streamed to disk")
+
+        filename = Path(upload.filename).name
+        content_type = attachment_content_type(filename, upload.mimetype)
+        sha256 = store_blob(blobs_dir, spool)
+
+        db = get_db()
+        insert_attachment(db, sha256, filename, content_type, spool.size)
+        db.commit()
+
+        if content_type.startswith("image/"):
+            state.queue_thumbnail(sha256)
+        return redirect(url_for("list_attachments"))
+
+    def get_attachment(sha256: str) -> sqlite3.Row:
+        attachment = fetch_attachment(get_db(), sha256)
+        if attachment is None:
+            abort(404)
+        return attachment
+
+    def send_blob(path: Path, sha256: str, mimetype: str, download_name: str, *, as_attachment: bool):
+        if not path.is_file():
+            abort(404)
+        response = send_file(
+            path,
+            mimetype=mimetype,
+            as_attachment=as_attachment,
+            download_name=download_name,
+            conditional=True,
+            etag=sha256,
+            max_age=IMMUTABLE_MAX_AGE,
+        )
+        return mark_immutable(response)
+
+    @app.get("/attachments/<sha256>")
+    def view_attachment(sha256: str):
+        attachment = get_attachment(sha256)
+        content_type = attachment["content_type"]
+        return send_blob(
+            blob_path(blobs_dir, sha256),
+            sha256,
+            content_type,
+            attachment["filename"],
+            as_attachment=not content_type.startswith("image/"),
+        )
+
+    @app.get("/attachments/<sha256>/thumbnail")
+    def view_attachment_thumbnail(sha256: str):
+        attachment = get_attachment(sha256)
+        path = thumbnail_path(thumbnails_dir, sha256)
+        if not path.is_file():
+            response = redirect(url_for("view_attachment", sha256=sha256))
+            response.cache_control.no_store = True
+            return response
+        return send_blob(
+            path,
+            f"{sha256}-thumbnail",
+            "image/png",
+            f"{Path(attachment['filename']).stem}-thumbnail.png",
+            as_attachment=False,
+        )
+
+    app.reseed_pages = state.reseed_pages
+    app.wiki = state
+    state.start()
     return app
 
 
 if __name__ == "__main__":
-    app = create_app()
-    if len(sys.argv) > 1 and sys.argv[1] == "reseed":
-        inserted = app.reseed_pages()
-        print(
-            f"Replaced wiki contents with {inserted} seed page"
-            f"{'' if inserted == 1 else 's'}."
-        )
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command in {"reseed", "maintain"}:
+        # One-off commands only need the database, not the serving machinery.
+        configure_tracing()
+        data_dir = resolve_data_dir()
+        data_dir.mkdir(parents=True, exist_ok=True)
+        db_path = data_dir / "wiki.db"
+        init_database(db_path, resolve_seed_dir())
+
+        if command == "reseed":
+            inserted = reseed_database(db_path, resolve_seed_dir())
+            print(
+                f"Replaced wiki contents with {inserted} seed page"
+                f"{'' if inserted == 1 else 's'}."
+            )
+            raise SystemExit(0)
+
+        with maintenance_lock(db_path, wait=True):
+            try:
+                before, after = run_maintenance(
+                    db_path,
+                    full=True,
+                    busy_timeout=MAINTENANCE_BUSY_TIMEOUT_SECONDS,
+                )
+            except sqlite3.OperationalError as exc:
+                print(f"Maintenance aborted: {exc}", file=sys.stderr)
+                raise SystemExit(1)
+        for label, stats in (("Before", before), ("After", after)):
+            print(
+                f"{label}: {stats['file_size']} bytes, {stats['page_count']} pages, "
+                f"{stats['freelist_count']} free pages"
+            )
+        if after["checkpoint_busy"]:
+            print("WAL checkpoint was blocked by active readers; it will finish on a later pass.")
         raise SystemExit(0)
+
+    app = create_app()
     port = int(os.environ.get("PORT", "8080"))
     app.run(host="0.0.0.0", port=port)
@@ -0,0 +1,412 @@
+import asyncio
+import contextvars
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+
+from markupsafe import Markup
+from quart import Quart, abort, g, redirect, render_template, request, url_for
+from quart.wrappers.response import FileBody
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from app import (
+    IMMUTABLE_MAX_AGE,
+    PROBE_PATHS,
+    UploadSpool,
+    WikiState,
+    _finish_request_span,
+    _start_request_span,
+    attachment_content_type,
+    blob_path,
+    build_excerpt,
+    choose_featured_page,
+    configure_tracing,
+    content_disposition,
+    fetch_attachment,
+    fetch_attachments,
+    fetch_page,
+    fetch_pages,
+    group_pages,
+    insert_attachment,
+    load_config,
+    mark_immutable,
+    markdown_html,
+    parse_page_form,
+    save_page_record,
+    store_blob,
+    thumbnail_path,
+)
+
+
+FILE_CHUNK_SIZE = 64 * 1024
+FILE_IO_WORKERS = 4
+
+
+class DatabaseExecutor:
+    """Runs SQLite work off the event loop: one writer thread and a pool of readers."""
+
+    def __init__(self, database: str, readers: int) -> None:
+        self.database = database
+        self._local = threading.local()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wiki-db-writer")
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="wiki-db-reader")
+
+    def _connection(self, *, read_only: bool) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.database)
+            db.row_factory = sqlite3.Row
+            if read_only:
+                db.execute("PRAGMA query_only = ON")
+            self._local.db = db
+        return db
+
+    def _run_read(self, fn, *args):
+        return fn(self._connection(read_only=True), *args)
+
+    def _run_write(self, fn, *args):
+        db = self._connection(read_only=False)
+        try:
+            result = fn(db, *args)
+        except BaseException:
+            db.rollback()
+            raise
+        db.commit()
+        return result
+
+    async def _submit(self, executor: ThreadPoolExecutor, runner, fn, *args):
+        # Carry the current span into the worker thread so SQL spans nest under the request.
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(executor, ctx.run, runner, fn, *args)
+
+    async def read(self, fn, *args):
+        return await self._submit(self._readers, self._run_read, fn, *args)
+
+    async def write(self, fn, *args):
+        return await self._submit(self._writer, self._run_write, fn, *args)
+
+    def shutdown(self) -> None:
+        self._writer.shutdown(wait=True)
+        self._readers.shutdown(wait=True)
+
+
+class AsyncSingleFlight:
+    """Coalesce concurrent awaits for the same key into one task."""
+
+    def __init__(self) -> None:
+        self._tasks: dict = {}
+
+    async def do(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        # Shield so one disconnecting client does not cancel the render for the others.
+        return await asyncio.shield(task)
+
+    def _forget(self, key, task: asyncio.Task) -> None:
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()
+
+
+def open_file_body(path: Path) -> FileBody | None:
+    if not path.is_file():
+        return None
+    return FileBody(path, buffer_size=FILE_CHUNK_SIZE)
+
+
+def create_async_app(test_config: dict | None = None) -> Quart:
+    app = Quart(__name__)
+    app.config.update(
+        DB_READERS=int(os.environ.get("WIKI_DB_READERS", "8")),
+        RENDER_PROCESSES=int(os.environ.get("WIKI_RENDER_PROCESSES", "2")),
+    )
+    app.config.update(load_config(test_config))
+
+    state = WikiState(app.config, app.logger)
+    blobs_dir = state.blobs_dir
+    thumbnails_dir = state.thumbnails_dir
+    render_cache = state.render_cache
+    database = DatabaseExecutor(app.config["DATABASE"], app.config["DB_READERS"])
+    render_pool = (
+        ProcessPoolExecutor(
+            max_workers=app.config["RENDER_PROCESSES"],
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        if app.config["RENDER_PROCESSES"] > 0
+        else None
+    )
+    render_flights = AsyncSingleFlight()
+    # Uploads, blob renames and stats go here so filesystem latency never stalls the loop.
+    file_io = ThreadPoolExecutor(max_workers=FILE_IO_WORKERS, thread_name_prefix="wiki-files")
+
+    async def run_file_io(fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(file_io, fn, *args)
+
+    @app.before_request
+    async def record_activity() -> None:
+        if request.path not in PROBE_PATHS:
+            state.maintenance.touch()
+
+    if configure_tracing():
+        @app.before_request
+        async def begin_request_span() -> None:
+            if request.path in PROBE_PATHS:
+                return
+            _start_request_span(request, g)
+
+        @app.after_request
+        async def end_request_span(response):
+            _finish_request_span(g, status_code=response.status_code)
+            return response
+
+        @app.teardown_request
+        async def teardown_request_span(error_obj: BaseException | None) -> None:
+            if error_obj is not None:
+                _finish_request_span(g, error_obj=error_obj)
+
+    @app.teardown_request
+    async def discard_upload_spools(_error: BaseException | None) -> None:
+        for spool in g.pop("_upload_spools", []):
+            await run_file_io(spool.discard)
+
+    @app.before_serving
+    async def start_render_pool() -> None:
+        # Workers spawn lazily and each one imports app.py; pay for that before
+        # uvicorn starts accepting connections rather than on the first cache miss.
+        if render_pool is None:
+            return
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(render_pool, markdown_html, "")
+                for _ in range(app.config["RENDER_PROCESSES"])
+            )
+        )
+
+    @app.after_serving
+    async def shutdown_executors() -> None:
+        database.shutdown()
+        file_io.shutdown(wait=True)
+        state.close()
+        if render_pool is not None:
+            render_pool.shutdown(wait=True)
+
+    async def render_page_body(slug: str, version: str, source: str) -> Markup:
+        cached = render_cache.lookup(slug, version)
+        if cached is not None:
+            return cached
+
+        async def render() -> Markup:
+            cached = render_cache.lookup(slug, version)
+            if cached is not None:
+                return cached
+            html = Markup(await asyncio.get_running_loop().run_in_executor(render_pool, markdown_html, source))
+            render_cache.store(slug, version, html)
+            return html
+
+        return await render_flights.do((slug, version), render)
+
+    @app.template_filter("excerpt")
+    def excerpt_filter(value: str, limit: int = 260) -> str:
+        return build_excerpt(value, limit)
+
+    @app.context_processor
+    async def inject_globals() -> dict:
+        return {"site_name": app.config["SITE_NAME"]}
+
+    @app.get("/healthz")
+    async def healthz():
+        return {"status": "ok"}
+
+    @app.get("/readyz")
+    async def readyz():
+        if not state.warmup_complete.is_set():
+            return {"status": "warming"}, 503
+        return {"status": "ready", "cached_pages": len(render_cache)}
+
+    @app.get("/")
+    async def index():
+        return redirect(url_for("list_pages"))
+
+    @app.get("/pages")
+    async def list_pages():
+        query = request.args.get("q", "").strip()
+        pages = await database.read(fetch_pages, query)
+        return await render_template(
+            "list.html",
+            pages=pages,
+            featured_page=choose_featured_page(pages),
+            grouped_pages=group_pages(pages),
+            query=query,
+        )
+
+    @app.get("/pages/new")
+    async def new_page():
+        return await render_template(
+            "edit.html",
+            page={"slug": "", "title": "", "body": ""},
+            is_new=True,
+        )
+
+    @app.post("/pages")
+    async def save_page():
+        try:
+            page = parse_page_form(await request.form)
+        except ValueError as exc:
+            abort(400, str(exc))
+
+        try:
+            if not await database.write(save_page_record, page):
+                abort(404)
+        except sqlite3.IntegrityError:
+            abort(409, "A page with that slug already exists")
+
+        if page["original_slug"]:
+            render_cache.discard(page["original_slug"])
+        return redirect(url_for("view_page", slug=page["slug"]))
+
+    @app.get("/pages/<slug>")
+    async def view_page(slug: str):
+        page = await database.read(fetch_page, slug)
+        if page is None:
+            abort(404)
+        page_html, nav_pages = await asyncio.gather(
+            render_page_body(page["slug"], page["updated_at"], page["body"]),
+            database.read(fetch_pages),
+        )
+        return await render_template(
+            "view.html",
+            page=page,
+            page_html=page_html,
+            nav_pages=nav_pages,
+            grouped_pages=group_pages(nav_pages),
+        )
+
+    @app.get("/pages/<slug>/edit")
+    async def edit_page(slug: str):
+        page = await database.read(fetch_page, slug)
+        if page is None:
+            abort(404)
+        return await render_template("edit.html", page=page, is_new=False)
+
+    @app.get("/attachments")
+    async def list_attachments():
+        attachments = await database.read(fetch_attachments)
+        return await render_template("attachments.html", attachments=attachments)
+
+    async def receive_upload(field: str) -> tuple[str, str | None, UploadSpool]:
+        # Quart's form parser writes file parts synchronously on the event loop, so
+        # decode the body here and await every chunk write on the file executor.
+        boundary = request.mimetype_params.get("boundary", "").encode("ascii")
+        if request.mimetype != "multipart/form-data" or not boundary:
+            abort(400, "File is required")
+
+        decoder = MultipartDecoder(boundary, request.max_content_length)
+        upload: tuple[str, str | None, UploadSpool] | None = None
+        receiving = False
+        upload_finished = False
+        body_finished = False
+        chunks = aiter(request.body)
+        try:
+            while True:
+                # A None chunk tells the decoder the body has ended so it can emit the epilogue.
+                chunk = await anext(chunks, None)
+                decoder.receive_data(chunk)
+                event = decoder.next_event()
+                while not isinstance(event, (Epilogue, NeedData)):
+                    if isinstance(event, File) and event.name == field and upload is None and event.filename:
+                        spool = await run_file_io(UploadSpool, app.config["ATTACHMENTS_DIR"] / "incoming")
+                        g.setdefault("_upload_spools", []).append(spool)
+                        upload = (event.filename, event.headers.get("content-type"), spool)
+                        receiving = True
+                    elif isinstance(event, (Field, File)):
+                        receiving = False
+                    elif isinstance(event, Data) and receiving:
+                        await run_file_io(upload[2].write, event.data)
+                        upload_finished = not event.more_data
+                    event = decoder.next_event()
+                body_finished = isinstance(event, Epilogue)
+                if body_finished or chunk is None:
+                    break
+        except ValueError:
+            abort(400, "Malformed multipart body")
+
+        if upload is None:
+            abort(400, "File is required")
+        # A client that disconnects mid-upload ends the body without the closing
+        # boundary; storing what arrived would publish a truncated attachment.
+        if not (upload_finished and body_finished):
+            abort(400, "Upload was truncated")
+        return upload
+
+    @app.post("/attachments")
+    async def upload_attachment():
+        upload_name, mimetype, spool = await receive_upload("file")
+        filename = Path(upload_name).name
+        content_type = attachment_content_type(filename, mimetype)
+        sha256 = await run_file_io(store_blob, blobs_dir, spool)
+        await database.write(insert_attachment, sha256, filename, content_type, spool.size)
+
+        if content_type.startswith("image/"):
+            state.queue_thumbnail(sha256)
+        return redirect(url_for("list_attachments"))
+
+    async def get_attachment(sha256: str) -> sqlite3.Row:
+        attachment = await database.read(fetch_attachment, sha256)
+        if attachment is None:
+            abort(404)
+        return attachment
+
+    async def send_blob(path: Path, etag: str, mimetype: str, download_name: str, *, as_attachment: bool):
+        body = await run_file_io(open_file_body, path)
+        if body is None:
+            abort(404)
+        response = app.response_class(body, mimetype=mimetype)
+        response.content_length = body.size
+        disposition, names = content_disposition(download_name, as_attachment=as_attachment)
+        response.headers.set("Content-Disposition", disposition, **names)
+        response.cache_control.max_age = IMMUTABLE_MAX_AGE
+        response.set_etag(etag)
+        await response.make_conditional(request, accept_ranges=True, complete_length=body.size)
+        return mark_immutable(response)
+
+    @app.get("/attachments/<sha256>")
+    async def view_attachment(sha256: str):
+        attachment = await get_attachment(sha256)
+        content_type = attachment["content_type"]
+        return await send_blob(
+            blob_path(blobs_dir, sha256),
+            sha256,
+            content_type,
+            attachment["filename"],
+            as_attachment=not content_type.startswith("image/"),
+        )
+
+    @app.get("/attachments/<sha256>/thumbnail")
+    async def view_attachment_thumbnail(sha256: str):
+        attachment = await get_attachment(sha256)
+        path = thumbnail_path(thumbnails_dir, sha256)
+        if not await run_file_io(path.is_file):
+            response = redirect(url_for("view_attachment", sha256=sha256))
+            response.cache_control.no_store = True
+            return response
+        return await send_blob(
+            path,
+            f"{sha256}-thumbnail",
+            "image/png",
+            f"{Path(attachment['filename']).stem}-thumbnail.png",
+            as_attachment=False,
+        )
+
+    app.wiki = state
+    app.database = database
+    app.render_pool = render_pool
+    state.start()
+    return app
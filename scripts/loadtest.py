@@ -0,0 +1,135 @@
+"""Keep-alive HTTP load generator for comparing the WSGI and ASGI servers.
+
+Only uses the standard library so it can run from any pod or laptop:
+
+    python scripts/loadtest.py --url http://127.0.0.1:8080 --connections 200 --slow-clients 50
+
+Slow clients open a connection, send part of a request line and then stall, which is how a
+handful of bad networks or stuck proxies tie up a threaded server.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, bool]:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    status = int(lines[0].split(" ", 2)[1])
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        while True:
+            size = int((await reader.readuntil(b"\r\n")).split(b";", 1)[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", "0")))
+    return status, headers.get("connection", "").lower() == "close"
+
+
+async def worker(host, port, paths, deadline, timeout, latencies, errors, *, hold_after_first):
+    reader = writer = None
+    index = 0
+    while time.monotonic() < deadline:
+        try:
+            started = time.perf_counter()
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            path = paths[index % len(paths)]
+            index += 1
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+            await writer.drain()
+            status, closed = await asyncio.wait_for(read_response(reader), timeout)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+            if closed:
+                writer.close()
+                writer = None
+            if hold_after_first:
+                await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as exc:
+            errors.append(type(exc).__name__)
+            if writer is not None:
+                writer.close()
+            writer = None
+            await asyncio.sleep(0.05)
+    if writer is not None:
+        writer.close()
+
+
+async def slow_client(host, port, deadline):
+    try:
+        _, writer = await asyncio.open_connection(host, port)
+    except OSError:
+        return
+    writer.write(b"GET /pages HTTP/1.1\r\n")
+    await writer.drain()
+    await asyncio.sleep(max(0.0, deadline - time.monotonic()))
+    writer.close()
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run(args: argparse.Namespace) -> None:
+    parts = urlsplit(args.url)
+    host, port = parts.hostname, parts.port or 80
+    paths = args.path or ["/pages", "/pages/cluster-overview", "/pages/service-catalog"]
+    deadline = time.monotonic() + args.duration
+    latencies: list[float] = []
+    errors: list = []
+
+    tasks = [asyncio.create_task(slow_client(host, port, deadline)) for _ in range(args.slow_clients)]
+    tasks += [
+        asyncio.create_task(worker(host, port, paths, deadline, args.timeout, [], errors, hold_after_first=True))
+        for _ in range(args.idle_connections)
+    ]
+    await asyncio.sleep(0.5)
+    started = time.monotonic()
+    tasks += [
+        asyncio.create_task(worker(host, port, paths, deadline, args.timeout, latencies, errors, hold_after_first=False))
+        for _ in range(args.connections)
+    ]
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+
+    print(f"connections={args.connections} slow_clients={args.slow_clients} idle_connections={args.idle_connections}")
+    print(f"requests={len(latencies)} errors={len(errors)} rps={len(latencies) / elapsed:.1f}")
+    if latencies:
+        print(
+            "latency_ms "
+            f"p50={percentile(latencies, 0.50) * 1000:.1f} "
+            f"p90={percentile(latencies, 0.90) * 1000:.1f} "
+            f"p99={percentile(latencies, 0.99) * 1000:.1f} "
+            f"mean={statistics.fmean(latencies) * 1000:.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8080")
+    parser.add_argument("--path", action="append", help="Path to request; repeat to rotate through several")
+    parser.add_argument("--connections", type=int, default=64, help="Keep-alive connections issuing requests")
+    parser.add_argument("--slow-clients", type=int, default=0, help="Connections that send a partial request and stall")
+    parser.add_argument("--idle-connections", type=int, default=0, help="Connections that make one request then sit idle")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Seconds before a request counts as an error")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,26 @@
+import hashlib
+import io
+import sqlite3
 import tempfile
+import threading
+import time
 import unittest
+import unittest.mock
 from pathlib import Path
 
-from app import create_app
+from PIL import Image
+
+from app import (
+    MaintenanceScheduler,
+    RenderCache,
+    SingleFlight,
+    create_app,
+    init_database,
+    maintenance_lock,
+    run_maintenance,
+    warm_render_cache,
+    write_thumbnail,
+)
 
 
 class WikiAppTests(unittest.TestCase):
@@ -187,6 +205,285 @@ class WikiAppTests(unittest.TestCase):
         self.assertIn(b"Current managed seed body.", response.data)
         self.assertNotIn(b"Edited locally.", response.data)
 
+    def test_view_reflects_edit_after_render_is_cached(self):
+        self.client.post("/pages", data={"title": "Cache", "body": "First render."})
+        self.assertIn(b"First render.", self.client.get("/pages/cache").data)
+
+        self.client.post(
+            "/pages",
+            data={"original_slug": "cache", "title": "Cache", "body": "Second render."},
+        )
+        response = self.client.get("/pages/cache")
+        self.assertIn(b"Second render.", response.data)
+        self.assertNotIn(b"First render.", response.data)
+
+    def test_single_flight_coalesces_concurrent_calls(self):
+        flight = SingleFlight()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            release.wait(timeout=5)
+            return "rendered"
+
+        threads = [
+            threading.Thread(target=lambda: results.append(flight.do("slug", compute)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            in_flight = flight._flights.get("slug")
+            if in_flight is not None and in_flight.waiters == 4:
+                break
+            time.sleep(0.001)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ["rendered"] * 5)
+
+    def test_warmup_keeps_newest_pages_when_cache_is_small(self):
+        db = sqlite3.connect(self.app.config["DATABASE"])
+        db.executemany(
+            """
+            INSERT INTO pages (slug, title, body, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (f"p{index}", f"P{index}", f"Body {index}", f"2026-01-{index + 1:02d}", f"2026-01-{index + 1:02d}")
+                for index in range(10)
+            ],
+        )
+        db.commit()
+
+        cache = RenderCache(max_entries=3)
+        warmed = warm_render_cache(db, cache, budget_seconds=10)
+        db.close()
+
+        self.assertEqual(warmed, 3)
+        for index in (9, 8, 7):
+            self.assertIsNotNone(cache.lookup(f"p{index}", f"2026-01-{index + 1:02d}"))
+        self.assertIsNone(cache.lookup("p6", "2026-01-07"))
+
+    def test_readiness_waits_for_warmup(self):
+        seed_dir = Path(self.temp_dir.name) / "seed-pages"
+        seed_dir.mkdir()
+        (seed_dir / "cluster.md").write_text(
+            "---\n"
+            "title: Seed Page\n"
+            "slug: seed-page\n"
+            "---\n"
+            "Warm me up.\n",
+            encoding="utf-8",
+        )
+
+        data_dir = Path(self.temp_dir.name) / "seeded-data"
+        app = create_app(
+            {
+                "TESTING": True,
+                "DATA_DIR": data_dir,
+                "DATABASE": str(data_dir / "wiki.db"),
+                "SEED_DIR": seed_dir,
+                "SITE_NAME": "Seeded Wiki",
+                "WARMUP_BACKGROUND": False,
+            }
+        )
+        client = app.test_client()
+
+        self.assertEqual(client.get("/healthz").status_code, 200)
+        ready = client.get("/readyz")
+        self.assertEqual(ready.status_code, 200)
+        self.assertEqual(ready.get_json()["cached_pages"], 1)
+
+        app.wiki.warmup_complete.clear()
+        self.assertEqual(client.get("/readyz").status_code, 503)
+        self.assertEqual(client.get("/healthz").status_code, 200)
+
+    def upload(self, content: bytes, filename: str, content_type: str):
+        return self.client.post(
+            "/attachments",
+            data={"file": (io.BytesIO(content), filename, content_type)},
+            content_type="multipart/form-data",
+        )
+
+    def test_attachments_are_deduplicated_by_content(self):
+        content = b"kubectl get pods -A\n" * 1000
+        sha256 = hashlib.sha256(content).hexdigest()
+
+        self.assertEqual(self.upload(content, "pods.txt", "text/plain").status_code, 302)
+        self.assertEqual(self.upload(content, "pods-copy.txt", "text/plain").status_code, 302)
+
+        attachments_dir = Path(self.temp_dir.name) / "attachments"
+        blobs = [path for path in (attachments_dir / "blobs").rglob("*") if path.is_file()]
+        self.assertEqual(blobs, [attachments_dir / "blobs" / sha256[:2] / sha256])
+        self.assertEqual(list((attachments_dir / "incoming").iterdir()), [])
+
+        listing = self.client.get("/attachments")
+        self.assertIn(b"pods.txt", listing.data)
+        self.assertIn(b"pods-copy.txt", listing.data)
+
+    def test_attachment_serving_supports_etags_and_ranges(self):
+        content = b"0123456789" * 100
+        sha256 = hashlib.sha256(content).hexdigest()
+        self.upload(content, "digits.txt", "text/plain")
+
+        response = self.client.get(f"/attachments/{sha256}")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, content)
+        self.assertEqual(response.headers["ETag"], f'"{sha256}"')
+        self.assertIn("immutable", response.headers["Cache-Control"])
+        self.assertIn("attachment", response.headers["Content-Disposition"])
+        response.close()
+
+        not_modified = self.client.get(
+            f"/attachments/{sha256}",
+            headers={"If-None-Match": f'"{sha256}"'},
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+        partial = self.client.get(f"/attachments/{sha256}", headers={"Range": "bytes=10-19"})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.data, content[10:20])
+        partial.close()
+
+        self.assertEqual(self.client.get("/attachments/" + "0" * 64).status_code, 404)
+
+    def test_image_attachments_get_thumbnails(self):
+        buffer = io.BytesIO()
+        Image.new("RGB", (1200, 800), "navy").save(buffer, format="JPEG")
+        sha256 = hashlib.sha256(buffer.getvalue()).hexdigest()
+        self.upload(buffer.getvalue(), "diagram.jpg", "image/jpeg")
+        self.app.wiki.thumbnail_executor.shutdown(wait=True)
+
+        response = self.client.get(f"/attachments/{sha256}/thumbnail")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, "image/png")
+        with Image.open(io.BytesIO(response.data)) as thumbnail:
+            self.assertLessEqual(max(thumbnail.size), 320)
+        response.close()
+
+    def test_failed_thumbnail_leaves_no_temp_file(self):
+        source = Path(self.temp_dir.name) / "wide.png"
+        Image.new("RGB", (64, 64), "navy").save(source, format="PNG")
+        target = Path(self.temp_dir.name) / "thumbs" / "wide.png"
+
+        with unittest.mock.patch.object(Image.Image, "save", side_effect=OSError("disk full")):
+            self.assertFalse(write_thumbnail(source, target))
+
+        self.assertEqual(list(target.parent.iterdir()), [])
+
+    def test_init_db_migrates_existing_database_to_incremental_vacuum(self):
+        data_dir = Path(self.temp_dir.name) / "legacy-data"
+        data_dir.mkdir()
+        legacy = sqlite3.connect(data_dir / "wiki.db")
+        legacy.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+        legacy.commit()
+        legacy.close()
+
+        create_app(
+            {
+                "TESTING": True,
+                "DATA_DIR": data_dir,
+                "DATABASE": str(data_dir / "wiki.db"),
+                "SEED_DIR": data_dir / "missing-seed",
+            }
+        )
+
+        db = sqlite3.connect(data_dir / "wiki.db")
+        self.assertEqual(db.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        self.assertEqual(db.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        db.close()
+
+    def test_init_db_waits_for_maintenance_lock_before_migrating(self):
+        data_dir = Path(self.temp_dir.name) / "locked-data"
+        data_dir.mkdir()
+        db_path = data_dir / "wiki.db"
+        legacy = sqlite3.connect(db_path)
+        legacy.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+        legacy.commit()
+        legacy.close()
+
+        with maintenance_lock(db_path, wait=True):
+            worker = threading.Thread(target=init_database, args=(db_path, data_dir / "missing-seed"))
+            worker.start()
+            worker.join(timeout=0.2)
+            self.assertTrue(worker.is_alive())
+            db = sqlite3.connect(db_path)
+            self.assertNotEqual(db.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+            db.close()
+        worker.join(timeout=5)
+        self.assertFalse(worker.is_alive())
+
+        db = sqlite3.connect(db_path)
+        self.assertEqual(db.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+        db.close()
+
+    def test_maintenance_reclaims_free_pages(self):
+        for index in range(40):
+            self.client.post(
+                "/pages",
+                data={"title": f"Page {index}", "body": "filler " * 2000},
+            )
+        db_path = Path(self.app.config["DATABASE"])
+        db = sqlite3.connect(db_path)
+        db.execute("DELETE FROM pages")
+        db.commit()
+        db.close()
+
+        before, after = run_maintenance(db_path, full=True)
+        self.assertGreater(before["freelist_count"], 0)
+        self.assertEqual(after["freelist_count"], 0)
+        self.assertLess(after["page_count"], before["page_count"])
+        self.assertLess(after["file_size"], before["file_size"])
+        self.assertEqual(after["checkpoint_busy"], 0)
+
+    def test_scheduled_maintenance_refreshes_statistics(self):
+        for index in range(20):
+            self.client.post("/pages", data={"title": f"Stats {index}", "body": "body"})
+        db_path = Path(self.app.config["DATABASE"])
+
+        run_maintenance(db_path)
+
+        db = sqlite3.connect(db_path)
+        stats = db.execute("SELECT tbl FROM sqlite_stat1 WHERE tbl = 'pages'").fetchall()
+        db.close()
+        self.assertTrue(stats)
+
+    def test_scheduled_pass_skips_while_maintain_command_holds_lock(self):
+        db_path = Path(self.app.config["DATABASE"])
+        scheduler = MaintenanceScheduler(
+            db_path,
+            interval_seconds=60,
+            idle_seconds=10,
+            logger=self.app.logger,
+        )
+        with maintenance_lock(db_path, wait=True) as acquired:
+            self.assertTrue(acquired)
+            self.assertFalse(scheduler.run_once())
+        self.assertTrue(scheduler.run_once())
+
+    def test_maintenance_waits_for_idle_period(self):
+        scheduler = MaintenanceScheduler(
+            Path(self.app.config["DATABASE"]),
+            interval_seconds=60,
+            idle_seconds=10,
+            logger=self.app.logger,
+        )
+        start = scheduler.last_run
+        scheduler.last_activity = start + 55
+
+        self.assertFalse(scheduler.is_due(start + 30))
+        self.assertFalse(scheduler.is_due(start + 60))
+        self.assertTrue(scheduler.is_due(start + 65))
+        scheduler.last_activity = start + 120
+        self.assertTrue(scheduler.is_due(start + 121))
+        self.assertTrue(scheduler.run_once())
+
 
 if __name__ == "__main__":
     unittest.main()
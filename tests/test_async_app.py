@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import tempfile
+import unittest
+from pathlib import Path
+
+from quart.datastructures import FileStorage
+
+from async_app import AsyncSingleFlight, create_async_app
+
+
+class AsyncWikiAppTests(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        data_dir = Path(self.temp_dir.name)
+        self.app = create_async_app(
+            {
+                "TESTING": True,
+                "DATA_DIR": data_dir,
+                "DATABASE": str(data_dir / "wiki.db"),
+                "SEED_DIR": data_dir / "missing-seed",
+                "SITE_NAME": "Test Wiki",
+                "WARMUP_BACKGROUND": False,
+                "RENDER_PROCESSES": 1,
+            }
+        )
+        self.test_app = self.app.test_app()
+        await self.test_app.startup()
+        self.addAsyncCleanup(self.test_app.shutdown)
+        self.client = self.test_app.test_client()
+
+    async def test_create_and_edit_page(self):
+        create_response = await self.client.post(
+            "/pages",
+            form={"title": "Runbook", "body": "# Welcome\n\nInitial content."},
+        )
+        self.assertEqual(create_response.status_code, 302)
+        self.assertIn("/pages/runbook", create_response.headers["Location"])
+
+        view_response = await self.client.get("/pages/runbook")
+        self.assertEqual(view_response.status_code, 200)
+        self.assertIn(b"<h1>Welcome</h1>", await view_response.get_data())
+
+        await self.client.post(
+            "/pages",
+            form={
+                "original_slug": "runbook",
+                "slug": "ops-runbook",
+                "title": "Ops Runbook",
+                "body": "Updated body.",
+            },
+        )
+        updated_view = await self.client.get("/pages/ops-runbook")
+        self.assertEqual(updated_view.status_code, 200)
+        self.assertIn(b"Updated body.", await updated_view.get_data())
+        self.assertEqual((await self.client.get("/pages/runbook")).status_code, 404)
+
+    async def test_duplicate_slug_is_rejected(self):
+        await self.client.post("/pages", form={"title": "Alpha", "body": "one"})
+        response = await self.client.post("/pages", form={"title": "Alpha", "body": "two"})
+        self.assertEqual(response.status_code, 409)
+
+    async def test_probes(self):
+        self.assertEqual((await self.client.get("/healthz")).status_code, 200)
+        self.assertEqual((await self.client.get("/readyz")).status_code, 200)
+
+    async def test_readiness_follows_shared_warmup_state(self):
+        self.app.wiki.warmup_complete.clear()
+        self.assertEqual((await self.client.get("/readyz")).status_code, 503)
+        self.app.wiki.warmup_complete.set()
+        self.assertEqual((await self.client.get("/readyz")).status_code, 200)
+
+    async def test_render_workers_start_before_serving(self):
+        render_pool = self.app.render_pool
+        self.assertEqual(len(render_pool._processes), self.app.config["RENDER_PROCESSES"])
+
+    async def test_attachment_upload_and_range_request(self):
+        content = b"0123456789" * 100
+        sha256 = hashlib.sha256(content).hexdigest()
+        spooled = tempfile.SpooledTemporaryFile()
+        spooled.write(content)
+        spooled.seek(0)
+        upload = await self.client.post(
+            "/attachments",
+            files={"file": FileStorage(spooled, "digits.txt", content_type="text/plain")},
+        )
+        self.assertEqual(upload.status_code, 302)
+        attachments_dir = Path(self.temp_dir.name) / "attachments"
+        self.assertTrue((attachments_dir / "blobs" / sha256[:2] / sha256).is_file())
+        self.assertEqual(list((attachments_dir / "incoming").iterdir()), [])
+
+        full = await self.client.get(f"/attachments/{sha256}")
+        self.assertEqual(await full.get_data(), content)
+        self.assertIn("attachment", full.headers["Content-Disposition"])
+
+        response = await self.client.get(f"/attachments/{sha256}", headers={"Range": "bytes=10-19"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(await response.get_data(), content[10:20])
+        self.assertEqual(response.headers["ETag"], f'"{sha256}"')
+        self.assertIn("immutable", response.headers["Cache-Control"])
+
+        not_modified = await self.client.get(
+            f"/attachments/{sha256}",
+            headers={"If-None-Match": f'"{sha256}"'},
+        )
+        self.assertEqual(not_modified.status_code, 304)
+
+    async def test_non_ascii_download_name_uses_encoded_filename(self):
+        content = b"notes"
+        sha256 = hashlib.sha256(content).hexdigest()
+        spooled = tempfile.SpooledTemporaryFile()
+        spooled.write(content)
+        spooled.seek(0)
+        await self.client.post(
+            "/attachments",
+            files={"file": FileStorage(spooled, "\u622a\u56fe notes.txt", content_type="text/plain")},
+        )
+
+        response = await self.client.get(f"/attachments/{sha256}")
+        self.assertEqual(
+            response.headers["Content-Disposition"],
+            "attachment; filename=\" notes.txt\"; filename*=UTF-8''%E6%88%AA%E5%9B%BE%20notes.txt",
+        )
+
+    async def test_upload_without_file_is_rejected(self):
+        response = await self.client.post("/attachments", form={"note": "no file"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((await self.client.get("/attachments/" + "0" * 64)).status_code, 404)
+
+    async def test_truncated_upload_is_rejected(self):
+        content = b"x" * 5000
+        body = (
+            b"--wikiboundary\r\n"
+            b'Content-Disposition: form-data; name="file"; filename="a.txt"\r\n'
+            b"Content-Type: text/plain\r\n\r\n" + content + b"\r\n--wikiboundary--\r\n"
+        )
+        response = await self.client.post(
+            "/attachments",
+            data=body[:3000],
+            headers={"Content-Type": "multipart/form-data; boundary=wikiboundary"},
+        )
+        self.assertEqual(response.status_code, 400)
+        attachments_dir = Path(self.temp_dir.name) / "attachments"
+        self.assertEqual(list((attachments_dir / "blobs").rglob("*")), [])
+        self.assertEqual(list((attachments_dir / "incoming").iterdir()), [])
+        self.assertNotIn(b"a.txt", await (await self.client.get("/attachments")).get_data())
+
+    async def test_single_flight_coalesces_concurrent_awaits(self):
+        flight = AsyncSingleFlight()
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "rendered"
+
+        results = await asyncio.gather(*(flight.do("slug", compute) for _ in range(5)))
+        self.assertEqual(calls, [1])
+        self.assertEqual(results, ["rendered"] * 5)
+
+
+if __name__ == "__main__":
+    unittest.main()